@@ -17,13 +17,25 @@ Files created:
 
 from __future__ import annotations
 
+import atexit
+import functools
 import json
+import math
 import os
+import queue
 import random
+import sys
+import threading
 import time
 import hashlib
-from dataclasses import dataclass, asdict
-from typing import Dict, List, Optional, Tuple
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import orjson  # optional: faster JSONL encode/decode
+except ImportError:
+    orjson = None
 
 
 # -----------------------------
@@ -36,8 +48,19 @@ def now_ts() -> float:
 def ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
-def stable_hash(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+# Bump whenever the fingerprint scheme changes; older records are re-keyed on load.
+# v1: sha256 (truncated), v2: blake2b-64 over JSON, v3: blake2b-64 over NUL-separated fields
+FINGERPRINT_VERSION = 3
+
+def json_line(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj) + b"\n"
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+def json_parse(line: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
 
 def normalize_step(step: str) -> str:
     # Normalize step text to reduce dependence on phrasing
@@ -46,19 +69,38 @@ def normalize_step(step: str) -> str:
     s = " ".join(s.split())
     return s
 
-def jaccard_similarity(a: List[str], b: List[str]) -> float:
-    sa, sb = set(a), set(b)
-    if not sa and not sb:
+def fingerprint_plan(goal: str, steps: Sequence[str]) -> str:
+    """
+    Store fingerprints rather than raw text for stable memory retrieval.
+    Normalized goal and steps are fed to the hasher directly, NUL-separated,
+    instead of building a canonical JSON document first.
+    """
+    h = hashlib.blake2b(digest_size=8)
+    h.update(goal.strip().lower().encode("utf-8"))
+    h.update(b"\x00")
+    for s in steps:
+        h.update(normalize_step(s).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+@functools.lru_cache(maxsize=1024)
+def _cached_fingerprint(goal: str, steps: Tuple[str, ...]) -> str:
+    return fingerprint_plan(goal, steps)
+
+def jaccard_similarity(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    # Callers pass prebuilt frozensets so no sets are allocated per comparison
+    if not a and not b:
         return 1.0
-    if not sa or not sb:
+    if not a or not b:
         return 0.0
-    return len(sa & sb) / len(sa | sb)
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
 
 # -----------------------------
 # Data models
 # -----------------------------
 
-@dataclass
+@dataclass(slots=True)
 class Plan:
     """
     Plan graph representation:
@@ -68,11 +110,11 @@ class Plan:
     """
     goal: str
     context_tags: List[str]
-    steps: List[str]
-    deps: List[Tuple[int, int]]
+    steps: Tuple[str, ...]
+    deps: Tuple[Tuple[int, int], ...]
     fingerprint: str
 
-@dataclass
+@dataclass(slots=True)
 class EpisodicRecord:
     fingerprint: str
     goal: str
@@ -83,8 +125,19 @@ class EpisodicRecord:
     confidence_after: float
     ts: float
     notes: str = ""
-
-@dataclass
+    # Records written before versioning carry no field and default to v1
+    fingerprint_version: int = 1
+
+@dataclass(slots=True)
+class FPStats:
+    """Per-fingerprint outcome stats, read together by the scorer."""
+    conf: float
+    succ: int = 0
+    fail: int = 0
+    part: int = 0
+    last_ts: Optional[float] = None
+
+@dataclass(slots=True)
 class PlanScoreBreakdown:
     base_confidence: float
     memory_evidence: float
@@ -93,6 +146,130 @@ class PlanScoreBreakdown:
     final_score: float
 
 
+# Hand-written serializers for the fixed schemas above; dataclasses.asdict
+# introspects fields and deep-copies values on every call.
+
+def _record_to_dict(rec: EpisodicRecord) -> Dict[str, Any]:
+    return {
+        "fingerprint": rec.fingerprint,
+        "goal": rec.goal,
+        "context_tags": rec.context_tags,
+        "steps": rec.steps,
+        "outcome": rec.outcome,
+        "score_delta": rec.score_delta,
+        "confidence_after": rec.confidence_after,
+        "ts": rec.ts,
+        "notes": rec.notes,
+        "fingerprint_version": rec.fingerprint_version,
+    }
+
+def _breakdown_to_dict(b: PlanScoreBreakdown) -> Dict[str, float]:
+    return {
+        "base_confidence": b.base_confidence,
+        "memory_evidence": b.memory_evidence,
+        "similarity": b.similarity,
+        "recency_weight": b.recency_weight,
+        "final_score": b.final_score,
+    }
+
+
+# -----------------------------
+# Background JSONL writer
+# -----------------------------
+
+class AsyncJsonlWriter:
+    """
+    Appends pre-encoded JSONL lines from a daemon thread so episodes never
+    block on disk I/O. The thread drains up to `batch_size` lines (or until
+    the queue has been idle for `flush_interval` seconds) and hands them to
+    the OS in a single write() on an O_APPEND descriptor: no userspace
+    buffer to flush, and each batch of whole lines lands contiguously even
+    with other processes appending to the same file.
+
+    A write error stops the writer: later lines are discarded, and the error
+    is re-raised from the next put(), flush() or close(). close() is
+    registered with atexit until it runs; use the writer as a context
+    manager (or call close()) to release the thread and descriptor early.
+    """
+
+    _CLOSE = object()
+
+    def __init__(self, path: str, batch_size: int = 64, flush_interval: float = 0.1):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._q: queue.Queue = queue.Queue()
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __enter__(self) -> "AsyncJsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def put(self, line: bytes) -> None:
+        if self._closed:
+            raise ValueError(f"writer for {self.path} is closed")
+        self._raise_error()
+        self._q.put(line)
+
+    def _run(self) -> None:
+        closing = False
+        while not closing:
+            item = self._q.get()
+            taken = 1
+            batch: List[bytes] = []
+            while True:
+                if item is self._CLOSE:
+                    closing = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._q.get(timeout=self.flush_interval)
+                except queue.Empty:
+                    break
+                taken += 1
+            # After a failure, keep draining so flush()/close() never hang
+            if batch and self._error is None:
+                try:
+                    self._write_all(b"".join(batch))
+                except Exception as e:
+                    self._error = e
+            for _ in range(taken):
+                self._q.task_done()
+        os.close(self._fd)
+
+    def _write_all(self, payload: bytes) -> None:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(self._fd, view):]
+
+    def flush(self) -> None:
+        """Block until every queued line has been written and flushed."""
+        self._q.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(self._CLOSE)
+        self._thread.join()
+        atexit.unregister(self.close)
+        self._raise_error()
+
+
 # -----------------------------
 # Episodic Memory Store (JSONL)
 # -----------------------------
@@ -101,68 +278,194 @@ class EpisodicMemory:
     """
     JSONL store of episodic outcomes keyed by plan fingerprint.
     Keeps an in-memory index for fast scoring.
+
+    Appends are handed to a background AsyncJsonlWriter; call flush() to
+    wait until pending records are on disk.
     """
 
     def __init__(self, path: str):
         self.path = path
         ensure_dir(os.path.dirname(path) or ".")
-        self.records: List[EpisodicRecord] = []
-        # Stats per fingerprint
-        self.confidence: Dict[str, float] = {}
-        self.successes: Dict[str, int] = {}
-        self.failures: Dict[str, int] = {}
-        self.partials: Dict[str, int] = {}
-        self.last_ts: Dict[str, float] = {}
-        self.context_history: Dict[str, List[List[str]]] = {}
+        # Records are not kept in memory; only the per-fingerprint index below.
+        # Use iter_records() to stream them back from disk.
+        # Stats per fingerprint (one lookup fetches every field)
+        self.stats: Dict[str, FPStats] = {}
+        # Distinct past contexts per fingerprint with their occurrence counts;
+        # contexts repeat heavily, so this stays small while history grows
+        self.context_counts: Dict[str, Counter] = {}
+        # Bumped on every indexed record; lets callers invalidate derived caches
+        self._version = 0
         self._load()
+        self._writer = AsyncJsonlWriter(self.path)
 
     def _load(self) -> None:
         if not os.path.exists(self.path):
             return
-        with open(self.path, "r", encoding="utf-8") as f:
+        with open(self.path, "rb") as f:
+            data = f.read()
+        for line in data.splitlines():
+            if not line.strip():
+                continue
+            self._index_record(self._parse_record(line))
+
+    @staticmethod
+    def _parse_record(line: bytes) -> EpisodicRecord:
+        obj = json_parse(line)
+        # Parsed tags are fresh strings per line; intern so duplicates share storage
+        obj["context_tags"] = [sys.intern(t) for t in obj["context_tags"]]
+        rec = EpisodicRecord(**obj)
+        if rec.fingerprint_version < FINGERPRINT_VERSION:
+            rec.fingerprint = fingerprint_plan(rec.goal, rec.steps)
+            rec.fingerprint_version = FINGERPRINT_VERSION
+        return rec
+
+    def iter_records(self) -> Iterator[EpisodicRecord]:
+        """
+        Stream every stored record from disk (pending appends are flushed first).
+        """
+        self.flush()
+        with open(self.path, "rb") as f:
             for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                obj = json.loads(line)
-                rec = EpisodicRecord(**obj)
-                self.records.append(rec)
-                self._index_record(rec)
+                if line.strip():
+                    yield self._parse_record(line)
 
     def _index_record(self, rec: EpisodicRecord) -> None:
+        self._version += 1
         fp = rec.fingerprint
-        self.confidence[fp] = rec.confidence_after
-        self.last_ts[fp] = rec.ts
-        self.context_history.setdefault(fp, []).append(rec.context_tags)
+        s = self.stats.get(fp)
+        if s is None:
+            s = self.stats[fp] = FPStats(conf=rec.confidence_after)
+        s.conf = rec.confidence_after
+        s.last_ts = rec.ts
+        self.context_counts.setdefault(fp, Counter())[frozenset(rec.context_tags)] += 1
 
         if rec.outcome == "success":
-            self.successes[fp] = self.successes.get(fp, 0) + 1
+            s.succ += 1
         elif rec.outcome == "failure":
-            self.failures[fp] = self.failures.get(fp, 0) + 1
+            s.fail += 1
         else:
-            self.partials[fp] = self.partials.get(fp, 0) + 1
+            s.part += 1
 
     def append(self, rec: EpisodicRecord) -> None:
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(asdict(rec), ensure_ascii=False) + "\n")
-        self.records.append(rec)
+        self._writer.put(json_line(_record_to_dict(rec)))
         self._index_record(rec)
 
+    def flush(self) -> None:
+        self._writer.flush()
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
     def get_confidence(self, fingerprint: str, default: float = 0.5) -> float:
-        return self.confidence.get(fingerprint, default)
+        s = self.stats.get(fingerprint)
+        return default if s is None else s.conf
 
     def get_stats(self, fingerprint: str) -> Dict[str, int]:
-        return {
-            "success": self.successes.get(fingerprint, 0),
-            "failure": self.failures.get(fingerprint, 0),
-            "partial": self.partials.get(fingerprint, 0),
-        }
+        s = self.stats.get(fingerprint)
+        if s is None:
+            return {"success": 0, "failure": 0, "partial": 0}
+        return {"success": s.succ, "failure": s.fail, "partial": s.part}
 
     def get_last_ts(self, fingerprint: str) -> Optional[float]:
-        return self.last_ts.get(fingerprint)
+        s = self.stats.get(fingerprint)
+        return None if s is None else s.last_ts
 
-    def get_context_history(self, fingerprint: str) -> List[List[str]]:
-        return self.context_history.get(fingerprint, [])
+    def batch_lookup(
+        self, fingerprints: List[str], default_conf: float = 0.5
+    ) -> List[Tuple[float, int, int, int, Optional[float]]]:
+        """
+        Rows of (confidence, successes, failures, partials, last_ts) for each
+        fingerprint, in order.
+        """
+        rows: List[Tuple[float, int, int, int, Optional[float]]] = []
+        for fp in fingerprints:
+            s = self.stats.get(fp)
+            if s is None:
+                rows.append((default_conf, 0, 0, 0, None))
+            else:
+                rows.append((s.conf, s.succ, s.fail, s.part, s.last_ts))
+        return rows
+
+    def mean_jaccard(self, fingerprint: str, tags: FrozenSet[str]) -> float:
+        """
+        Average Jaccard similarity between `tags` and every past context of
+        this fingerprint; one comparison per distinct context, weighted by count.
+        """
+        counts = self.context_counts.get(fingerprint)
+        if not counts:
+            return 0.0
+        s = self.stats[fingerprint]
+        total = sum(n * jaccard_similarity(tags, ctx) for ctx, n in counts.items())
+        return total / (s.succ + s.fail + s.part)
+
+
+# -----------------------------
+# Plan templates
+# -----------------------------
+
+# Minimal goal taxonomy for demo purposes. Templates are static, so their
+# linear dependencies are computed once here rather than per generated plan.
+
+def _linear_deps(steps: Tuple[str, ...]) -> Tuple[Tuple[int, int], ...]:
+    return tuple((i, i + 1) for i in range(len(steps) - 1))
+
+def _with_deps(templates: List[Tuple[str, ...]]) -> List[Tuple[Tuple[str, ...], Tuple[Tuple[int, int], ...]]]:
+    return [(steps, _linear_deps(steps)) for steps in templates]
+
+_DEBUG_TEMPLATES = _with_deps([
+    ("reproduce the issue", "isolate the failing component", "write a minimal test", "apply a fix", "verify with test suite", "document the change"),
+    ("collect logs and error traces", "identify likely root cause", "confirm with a targeted experiment", "patch the bug", "add regression test"),
+    ("simplify the scenario", "bisect recent changes", "pinpoint offending change", "fix and validate", "ship notes"),
+])
+
+_PLAN_TEMPLATES = _with_deps([
+    ("clarify objective and constraints", "break down into milestones", "estimate effort and risk", "sequence milestones", "define success metrics", "publish roadmap"),
+    ("define goal and scope", "identify dependencies", "prioritize tasks", "create timeline", "set checkpoints"),
+    ("write 1-page intent", "list deliverables", "rank by impact", "create a week-by-week plan", "review with stakeholders"),
+])
+
+_DEFAULT_TEMPLATES = _with_deps([
+    ("clarify the goal", "gather required inputs", "draft a plan", "execute steps", "review outcome", "log learnings"),
+    ("define constraints", "generate options", "pick best option", "execute", "evaluate", "store outcome"),
+    ("quick attempt", "inspect result", "iterate with improvements", "finalize", "document"),
+])
+
+
+# -----------------------------
+# Scoring kernel
+# -----------------------------
+
+def _score_kernel(
+    base_conf: float, succ: int, fail: int, part: int, similarity: float, recency: float
+) -> Tuple[float, float]:
+    """
+    Pure arithmetic part of plan scoring; returns (evidence, final_score).
+    """
+    # Evidence signal: + for successes, - for failures, small + for partials
+    # Normalized to [-1, 1] roughly
+    total = succ + fail + part
+    if total == 0:
+        evidence = 0.0
+    else:
+        evidence = (succ - fail + 0.25 * part) / max(1, total)
+
+    # Final score: weighted blend
+    # You can tune these weights; they’re intentionally simple.
+    final = (
+        0.55 * base_conf +
+        0.25 * evidence * (0.5 + 0.5 * similarity) +
+        0.20 * recency
+    )
+
+    # Clamp to [0, 1]
+    final = max(0.0, min(1.0, final))
+    return evidence, final
 
 
 # -----------------------------
@@ -176,11 +479,23 @@ class MemoryConditionedPlanner:
         decay_half_life_days: float = 14.0,   # plan decay over time
         epsilon: float = 0.15,               # exploration vs exploitation
         seed: int = 42,
+        epsilon_decay: float = 0.5,          # anneal: eps_t = min(epsilon, c/sqrt(t)); <= 0 keeps eps fixed
     ):
         self.memory = memory
         self.decay_half_life_days = decay_half_life_days
+        # 0.5^(age/half_life) == exp(k * age); a half-life <= 0 disables decay
+        self._decay_k = (
+            math.log(0.5) / (decay_half_life_days * 86400.0) if decay_half_life_days > 0 else 0.0
+        )
         self.epsilon = epsilon
-        random.seed(seed)
+        self.epsilon_decay = epsilon_decay
+        self.t = 0  # select_plan calls so far
+        # Private generator: exploration draws don't contend with (or get
+        # reseeded by) other users of the global `random` module
+        self.rng = random.Random(seed)
+        # (fingerprint, context tag set, memory version) -> breakdown
+        self._score_cache: Dict[tuple, PlanScoreBreakdown] = {}
+        self._score_cache_size = 4096
 
     # --- Plan generation ---
 
@@ -191,66 +506,40 @@ class MemoryConditionedPlanner:
         """
         goal_l = goal.lower().strip()
 
-        # Minimal goal taxonomy for demo purposes
-        templates: List[List[str]] = []
-
         if "debug" in goal_l or "fix" in goal_l:
-            templates = [
-                ["reproduce the issue", "isolate the failing component", "write a minimal test", "apply a fix", "verify with test suite", "document the change"],
-                ["collect logs and error traces", "identify likely root cause", "confirm with a targeted experiment", "patch the bug", "add regression test"],
-                ["simplify the scenario", "bisect recent changes", "pinpoint offending change", "fix and validate", "ship notes"],
-            ]
+            templates = _DEBUG_TEMPLATES
         elif "plan" in goal_l or "roadmap" in goal_l:
-            templates = [
-                ["clarify objective and constraints", "break down into milestones", "estimate effort and risk", "sequence milestones", "define success metrics", "publish roadmap"],
-                ["define goal and scope", "identify dependencies", "prioritize tasks", "create timeline", "set checkpoints"],
-                ["write 1-page intent", "list deliverables", "rank by impact", "create a week-by-week plan", "review with stakeholders"],
-            ]
+            templates = _PLAN_TEMPLATES
         else:
-            templates = [
-                ["clarify the goal", "gather required inputs", "draft a plan", "execute steps", "review outcome", "log learnings"],
-                ["define constraints", "generate options", "pick best option", "execute", "evaluate", "store outcome"],
-                ["quick attempt", "inspect result", "iterate with improvements", "finalize", "document"],
-            ]
+            templates = _DEFAULT_TEMPLATES
 
         plans: List[Plan] = []
-        for steps in templates:
-            deps = [(i, i + 1) for i in range(len(steps) - 1)]  # linear dependencies
-            fp = self.fingerprint_plan(goal, steps)
+        for steps, deps in templates:
             plans.append(
                 Plan(
                     goal=goal,
                     context_tags=context_tags,
                     steps=steps,
                     deps=deps,
-                    fingerprint=fp,
+                    fingerprint=self.fingerprint_plan(goal, steps),
                 )
             )
 
         return plans
 
-    def fingerprint_plan(self, goal: str, steps: List[str]) -> str:
-        """
-        Store fingerprints rather than raw text for stable memory retrieval.
-        """
-        norm_steps = [normalize_step(s) for s in steps]
-        canonical = json.dumps({"goal": goal.strip().lower(), "steps": norm_steps}, sort_keys=True)
-        return stable_hash(canonical)
+    def fingerprint_plan(self, goal: str, steps: Sequence[str]) -> str:
+        return _cached_fingerprint(goal, tuple(steps))
 
     # --- Scoring ---
 
-    def _recency_weight(self, last_ts: Optional[float]) -> float:
+    def _recency_weight(self, last_ts: Optional[float], now: float) -> float:
         """
         Exponential decay with half-life.
-        weight = 0.5^(age/half_life)
+        weight = 0.5^(age/half_life) = exp(k * age_seconds)
         """
         if last_ts is None:
             return 0.0
-        age_seconds = max(0.0, now_ts() - last_ts)
-        age_days = age_seconds / (60 * 60 * 24)
-        if self.decay_half_life_days <= 0:
-            return 1.0
-        return 0.5 ** (age_days / self.decay_half_life_days)
+        return math.exp(self._decay_k * max(0.0, now - last_ts))
 
     def score_plan(self, plan: Plan) -> PlanScoreBreakdown:
         """
@@ -259,64 +548,85 @@ class MemoryConditionedPlanner:
         - memory evidence (success/failure balance)
         - context similarity to past contexts for this fingerprint
         - recency decay
-        """
-        fp = plan.fingerprint
-        base_conf = self.memory.get_confidence(fp, default=0.5)
-        stats = self.memory.get_stats(fp)
-
-        # Evidence signal: + for successes, - for failures, small + for partials
-        # Normalized to [-1, 1] roughly
-        total = stats["success"] + stats["failure"] + stats["partial"]
-        if total == 0:
-            evidence = 0.0
-        else:
-            evidence = (stats["success"] - stats["failure"] + 0.25 * stats["partial"]) / max(1, total)
-
-        # Context similarity: compare current context to average similarity of past contexts for same fingerprint
-        ctx_hist = self.memory.get_context_history(fp)
-        if not ctx_hist:
-            similarity = 0.0
-        else:
-            sims = [jaccard_similarity(plan.context_tags, past) for past in ctx_hist]
-            similarity = sum(sims) / len(sims)
 
-        recency = self._recency_weight(self.memory.get_last_ts(fp))
+        Results are memoized until the memory changes; recency is therefore
+        as of the first scoring call after the last memory update.
+        """
+        return self.score_plans([plan])[plan.fingerprint]
 
-        # Final score: weighted blend
-        # You can tune these weights; they’re intentionally simple.
-        final = (
-            0.55 * base_conf +
-            0.25 * evidence * (0.5 + 0.5 * similarity) +
-            0.20 * recency
-        )
+    def score_plans(
+        self, plans: List[Plan], now: Optional[float] = None
+    ) -> Dict[str, PlanScoreBreakdown]:
+        """
+        Batched form of score_plan: cache misses are looked up in memory in
+        one pass and scored together against a single clock reading.
+        """
+        if now is None:
+            now = now_ts()
+        version = self.memory._version
+        scored: Dict[str, PlanScoreBreakdown] = {}
+        misses: List[Tuple[str, FrozenSet[str]]] = []
+        for p in plans:
+            tag_set = frozenset(p.context_tags)
+            cached = self._score_cache.get((p.fingerprint, tag_set, version))
+            if cached is not None:
+                scored[p.fingerprint] = cached
+            else:
+                misses.append((p.fingerprint, tag_set))
+        if not misses:
+            return scored
+
+        rows = self.memory.batch_lookup([fp for fp, _ in misses])
+        for (fp, tag_set), (base_conf, succ, fail, part, last_ts) in zip(misses, rows):
+            # Context similarity: compare current context to average similarity of past contexts for same fingerprint
+            similarity = self.memory.mean_jaccard(fp, tag_set)
+
+            recency = self._recency_weight(last_ts, now)
+
+            evidence, final = _score_kernel(base_conf, succ, fail, part, similarity, recency)
+
+            breakdown = PlanScoreBreakdown(
+                base_confidence=base_conf,
+                memory_evidence=evidence,
+                similarity=similarity,
+                recency_weight=recency,
+                final_score=final,
+            )
 
-        # Clamp to [0, 1]
-        final = max(0.0, min(1.0, final))
+            # FIFO eviction: dicts preserve insertion order
+            if len(self._score_cache) >= self._score_cache_size:
+                del self._score_cache[next(iter(self._score_cache))]
+            self._score_cache[(fp, tag_set, version)] = breakdown
+            scored[fp] = breakdown
 
-        return PlanScoreBreakdown(
-            base_confidence=base_conf,
-            memory_evidence=evidence,
-            similarity=similarity,
-            recency_weight=recency,
-            final_score=final,
-        )
+        return scored
 
     # --- Selection policy ---
 
+    def current_epsilon(self) -> float:
+        if self.epsilon_decay <= 0 or self.t == 0:
+            return self.epsilon
+        return min(self.epsilon, self.epsilon_decay / math.sqrt(self.t))
+
     def select_plan(self, plans: List[Plan]) -> Tuple[Plan, Dict[str, PlanScoreBreakdown]]:
         """
-        Epsilon-greedy:
-        - with probability epsilon, explore (random plan)
+        Annealed epsilon-greedy:
+        - with probability eps_t, explore (random plan)
         - otherwise exploit (max score)
+        eps_t starts at epsilon and decays as epsilon_decay / sqrt(t), so
+        exploration tapers off once memory has enough evidence.
+
+        The coin is flipped before scoring: when exploring, only the chosen
+        plan is scored, so the returned breakdowns cover just that plan.
         """
-        scored: Dict[str, PlanScoreBreakdown] = {}
-        for p in plans:
-            scored[p.fingerprint] = self.score_plan(p)
+        now = now_ts()
+        self.t += 1
 
-        if random.random() < self.epsilon:
-            chosen = random.choice(plans)
-            return chosen, scored
+        if self.rng.random() < self.current_epsilon():
+            chosen = self.rng.choice(plans)
+            return chosen, self.score_plans([chosen], now=now)
 
+        scored = self.score_plans(plans, now=now)
         chosen = max(plans, key=lambda p: scored[p.fingerprint].final_score)
         return chosen, scored
 
@@ -376,10 +686,22 @@ class TraceLogger:
     def __init__(self, path: str):
         self.path = path
         ensure_dir(os.path.dirname(path) or ".")
+        self._writer = AsyncJsonlWriter(self.path)
 
     def log(self, trace: Dict) -> None:
-        with open(self.path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(trace, ensure_ascii=False) + "\n")
+        self._writer.put(json_line(trace))
+
+    def flush(self) -> None:
+        self._writer.flush()
+
+    def close(self) -> None:
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
 
 
 # -----------------------------
@@ -432,12 +754,13 @@ def run_episode(
         fingerprint=chosen.fingerprint,
         goal=goal,
         context_tags=context_tags,
-        steps=chosen.steps,
+        steps=list(chosen.steps),
         outcome=outcome,
         score_delta=delta,
         confidence_after=new_conf,
         ts=now_ts(),
         notes=notes,
+        fingerprint_version=FINGERPRINT_VERSION,
     )
     memory.append(rec)
 
@@ -451,9 +774,10 @@ def run_episode(
                 "fingerprint": p.fingerprint,
                 "steps": p.steps,
                 "score": scored[p.fingerprint].final_score,
-                "score_breakdown": asdict(scored[p.fingerprint]),
+                "score_breakdown": _breakdown_to_dict(scored[p.fingerprint]),
             }
             for p in plans
+            if p.fingerprint in scored  # exploration scores only the chosen plan
         ],
         "chosen": {
             "fingerprint": chosen.fingerprint,
@@ -514,6 +838,7 @@ if __name__ == "__main__":
         memory=memory,
         decay_half_life_days=14.0,
         epsilon=0.15,
+        epsilon_decay=0.5,
         seed=42,
     )
 
@@ -531,5 +856,8 @@ if __name__ == "__main__":
         trace = run_episode(planner, world, memory, tracer, goal, ctx)
         pretty_print_trace(trace)
 
+    memory.flush()
+    tracer.flush()
+
     print(f"Saved memory to: {memory_path}")
     print(f"Saved traces to: {trace_path}")
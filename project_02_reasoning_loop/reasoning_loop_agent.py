@@ -7,6 +7,8 @@ import json
 import os
 import time
 import hashlib
+import heapq
+from collections import Counter, defaultdict
 from dataclasses import dataclass, asdict
 from typing import List, Dict, Optional
 import random
@@ -20,30 +22,24 @@ def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
 def stable_hash(text: str) -> str:
-    return hashlib.sha256(text.encode()).hexdigest()[:16]
+    return hashlib.blake2b(text.encode(), digest_size=8).hexdigest()
 
 def normalize(text: str) -> str:
     return " ".join(text.lower().strip().split())
 
-def jaccard(a: List[str], b: List[str]) -> float:
-    sa, sb = set(a), set(b)
-    if not sa or not sb:
-        return 0.0
-    return len(sa & sb) / len(sa | sb)
-
 # ---------- Data Models ----------
 
-@dataclass
+@dataclass(slots=True)
 class Observation:
     question: str
     context_tags: List[str]
 
-@dataclass
+@dataclass(slots=True)
 class Hypothesis:
     hypothesis: str
     fingerprint: str
 
-@dataclass
+@dataclass(slots=True)
 class Evidence:
     content: str
     tags: List[str]
@@ -64,19 +60,37 @@ class ReasoningTrace:
 class EvidenceStore:
     def __init__(self):
         self.evidence = []
+        # Inverted index: tag -> indices of evidence carrying it
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+        self._sizes: List[int] = []
 
     def add(self, content: str, tags: List[str]):
         fp = stable_hash(normalize(content))
-        self.evidence.append(Evidence(content, tags, fp))
+        e = Evidence(content, tags, fp)
+        idx = len(self.evidence)
+        self.evidence.append(e)
+        tag_set = frozenset(tags)
+        self._sizes.append(len(tag_set))
+        for t in tag_set:
+            self._postings[t].append(idx)
 
     def retrieve(self, tags: List[str], top_k=3):
+        # Only evidence sharing at least one tag can score > 0, so count
+        # intersections from the postings instead of scanning every item
+        query = frozenset(tags)
+        inter = Counter()
+        for t in query:
+            postings = self._postings.get(t)
+            if postings:
+                inter.update(postings)
+
+        q_len = len(query)
         scored = []
-        for e in self.evidence:
-            score = jaccard(tags, e.tags)
-            if score > 0:
-                scored.append((score, e))
-        scored.sort(reverse=True, key=lambda x: x[0])
-        return [e for _, e in scored[:top_k]]
+        for idx in sorted(inter):
+            n = inter[idx]
+            score = n / (q_len + self._sizes[idx] - n)
+            scored.append((score, self.evidence[idx]))
+        return [e for _, e in heapq.nlargest(top_k, scored, key=lambda x: x[0])]
 
 # ---------- Hypothesis Memory ----------
 
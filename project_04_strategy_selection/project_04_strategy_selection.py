@@ -3,11 +3,14 @@
 # Full end-to-end minimal implementation
 # ============================================
 
+from __future__ import annotations
+
+import math
 import time
 import hashlib
-import random
+from array import array
 from dataclasses import dataclass, asdict, field
-from typing import List, Dict, Optional
+from typing import List, Dict, FrozenSet, Optional, Tuple
 import json
 
 
@@ -19,16 +22,21 @@ def now_ts():
     return time.time()
 
 def stable_hash(text: str) -> str:
-    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    # Used only as a dict key: 8-byte blake2b is cheaper than sha256 and
+    # still deterministic across runs
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
 
 def normalize(text: str) -> str:
     return " ".join(text.lower().strip().split())
 
-def jaccard(a: List[str], b: List[str]) -> float:
-    sa, sb = set(a), set(b)
-    if not sa or not sb:
-        return 0.0
-    return len(sa & sb) / len(sa | sb)
+def jaccard_pre(sa: FrozenSet[str], sb: FrozenSet[str], la: int, lb: int) -> float:
+    """
+    Jaccard over prebuilt sets with known sizes; the union size is derived
+    from the intersection, so no union set is allocated.
+    """
+    inter = len(sa & sb)
+    union = la + lb - inter
+    return inter / union if union else 0.0
 
 
 # -----------------------------
@@ -36,64 +44,215 @@ def jaccard(a: List[str], b: List[str]) -> float:
 # -----------------------------
 
 class StrategyMemory:
+    """
+    Strategies keyed by fingerprint, plus a structure-of-arrays view of the
+    fields the selector reads. Numeric columns are packed `array`s (8 bytes
+    per entry instead of a pointer to a boxed object); all columns are
+    row-aligned with all(). Updates go through update_confidence, which keeps
+    the columns and the Strategy objects in sync.
+    """
+
     def __init__(self):
         self.strategies: Dict[str, Strategy] = {}
+        # Snapshot returned by all(); rebuilt only when membership changes
+        self._cached_tuple: Optional[Tuple[Strategy, ...]] = None
+        self._rows: Dict[str, int] = {}       # fingerprint -> row
+        # Tag sets as bitmasks over an interned tag universe (tag -> bit)
+        self._tag_bits: Dict[str, int] = {}
+        self._reset_columns()
+
+    def _reset_columns(self):
+        self.names: List[str] = []
+        self.confidences = array("d")
+        self.usage_counts = array("q")
+        self.tag_masks: List[int] = []
+        self.total_uses = 0                   # sum of usage_counts (UCB t)
 
     def add_strategy(self, strategy: Strategy):
+        replacing = strategy.fingerprint in self.strategies
         self.strategies[strategy.fingerprint] = strategy
+        self._cached_tuple = None
+        if replacing:
+            self._rebuild_columns()
+        else:
+            self._append_row(strategy)
+
+    def bulk_add(self, strategies: List[Strategy]):
+        """
+        Register many strategies at once. Fingerprints are already computed
+        at construction, so this only grows each column with a single extend
+        and invalidates all() once, instead of once per strategy.
+        """
+        strategies = list(strategies)
+        before = len(self.strategies)
+        for s in strategies:
+            self.strategies[s.fingerprint] = s
+        self._cached_tuple = None
+        if len(self.strategies) != before + len(strategies):
+            # Some fingerprints were replaced; row order follows the dict
+            self._rebuild_columns()
+            return
+
+        start = len(self.names)
+        self._rows.update((s.fingerprint, start + i) for i, s in enumerate(strategies))
+        self.names.extend(s.name for s in strategies)
+        self.confidences.extend(s.confidence for s in strategies)
+        self.usage_counts.extend(s.usage_count for s in strategies)
+        self.total_uses += sum(s.usage_count for s in strategies)
+        self.tag_masks.extend(self._tag_mask(s) for s in strategies)
+
+    def _tag_mask(self, strategy: Strategy) -> int:
+        mask = 0
+        for t in strategy.context_tags:
+            mask |= 1 << self._tag_bits.setdefault(t, len(self._tag_bits))
+        return mask
+
+    def _append_row(self, strategy: Strategy):
+        row = len(self.names)
+        self._rows[strategy.fingerprint] = row
+        self.names.append(strategy.name)
+        self.confidences.append(strategy.confidence)
+        self.usage_counts.append(strategy.usage_count)
+        self.total_uses += strategy.usage_count
+        self.tag_masks.append(self._tag_mask(strategy))
+
+    def _rebuild_columns(self):
+        self._reset_columns()
+        self._rows = {}
+        for s in self.strategies.values():
+            self._append_row(s)
+
+    def all(self) -> Tuple[Strategy, ...]:
+        if self._cached_tuple is None:
+            self._cached_tuple = tuple(self.strategies.values())
+        return self._cached_tuple
+
+    def query_mask(self, ctx_set: FrozenSet[str]) -> Tuple[int, int]:
+        """
+        Returns (mask of known tags, count of tags no strategy carries).
+        Unknown tags can't intersect anything but still widen the union.
+        """
+        mask = 0
+        unknown = 0
+        for t in ctx_set:
+            bit = self._tag_bits.get(t)
+            if bit is None:
+                unknown += 1
+            else:
+                mask |= 1 << bit
+        return mask, unknown
+
+    def update_confidence(self, fp: str, delta: float, ts: Optional[float] = None):
+        row = self._rows[fp]
+        conf = max(0.05, min(0.95, self.confidences[row] + delta))
+        if ts is None:
+            ts = now_ts()
+        self.confidences[row] = conf
+        self.usage_counts[row] += 1
+        self.total_uses += 1
 
-    def all(self) -> List[Strategy]:
-        return list(self.strategies.values())
-
-    def update_confidence(self, fp: str, delta: float):
         s = self.strategies[fp]
-        s.confidence = max(0.05, min(0.95, s.confidence + delta))
-        s.usage_count += 1
-        s.last_used_ts = now_ts()
+        s.confidence = conf
+        s.usage_count = self.usage_counts[row]
+        s.last_used_ts = ts
 
 
 # -----------------------------
 # Strategy Selector
 # -----------------------------
 
+# Score = _W_CONF * confidence + _W_SIM * similarity
+_W_CONF = 0.6
+_W_SIM = 0.4
+
+def _score_all(confidences, tag_masks: List[int], q_mask: int, q_unknown: int) -> List[float]:
+    """
+    Scoring kernel over the memory's columns: Jaccard from the popcounts of
+    the tag masks and the confidence blend, fused into one pass per row.
+    Rows sharing no tag with the query skip the similarity math entirely.
+    """
+    scores = []
+    for conf, m in zip(confidences, tag_masks):
+        inter = m & q_mask
+        if not inter:
+            scores.append(_W_CONF * conf)
+            continue
+        union = (m | q_mask).bit_count() + q_unknown
+        scores.append(_W_CONF * conf + _W_SIM * inter.bit_count() / union)
+    return scores
+
+
 class StrategySelector:
-    def __init__(self, memory: StrategyMemory, exploration_rate: float = 0.15):
+    """
+    UCB1 selection: each strategy's score gets an exploration bonus
+    sqrt(ucb_alpha * ln(t) / N_i), where t counts all selections and N_i is
+    the strategy's usage_count. Rarely used strategies are retried in
+    proportion to how uncertain they are, instead of at a fixed random rate.
+    """
+
+    def __init__(self, memory: StrategyMemory, ucb_alpha: float = 0.15):
         self.memory = memory
-        self.exploration_rate = exploration_rate
-
-    def score_strategy(self, strategy: Strategy, context_tags: List[str]) -> float:
-        similarity = jaccard(strategy.context_tags, context_tags)
+        self.ucb_alpha = ucb_alpha
+
+    def score_strategy(self, strategy: Strategy, ctx_set: FrozenSet[str], ctx_len: int) -> float:
+        """
+        Score a single strategy. The query set and its size are loop
+        invariants: build them once (frozenset(tags), len(...)) and reuse
+        them across strategies.
+        """
+        tags = frozenset(strategy.context_tags)
+        similarity = jaccard_pre(tags, ctx_set, len(tags), ctx_len)
         score = (
-            0.6 * strategy.confidence +
-            0.4 * similarity
+            _W_CONF * strategy.confidence +
+            _W_SIM * similarity
         )
         return score
 
-    def select(self, context_tags: List[str]) -> StrategyDecision:
-        scores = {}
+    def select(self, context_tags: List[str], record_considered: bool = False) -> StrategyDecision:
+        """
+        Pick a strategy for the context. The per-strategy score map is only
+        built when record_considered is set; otherwise considered is None.
+        """
+        # One clock read per decision, shared by the update and the record
+        now = now_ts()
         strategies = self.memory.all()
-
-        for s in strategies:
-            scores[s.name] = self.score_strategy(s, context_tags)
-
-        # Exploration
-        if random.random() < self.exploration_rate:
-            chosen = random.choice(strategies)
-            note = "exploration"
-        else:
-            chosen = max(strategies, key=lambda s: scores[s.name])
+        ctx_set = frozenset(context_tags)
+
+        # Same blend as score_strategy, computed over the whole pool at once
+        q_mask, q_unknown = self.memory.query_mask(ctx_set)
+        score_vec = _score_all(self.memory.confidences, self.memory.tag_masks, q_mask, q_unknown)
+
+        # Exploration bonus; ln(t) is shared, so only N_i varies per strategy.
+        # The UCB and greedy argmaxes are tracked in the same pass.
+        c = self.ucb_alpha * math.log(self.memory.total_uses + 1)
+        sqrt = math.sqrt
+        best = greedy = 0
+        best_ucb = best_score = -math.inf
+        for row, (sc, n) in enumerate(zip(score_vec, self.memory.usage_counts)):
+            ucb = sc + sqrt(c / (n if n > 1 else 1))
+            if ucb > best_ucb:
+                best_ucb, best = ucb, row
+            if sc > best_score:
+                best_score, greedy = sc, row
+
+        chosen = strategies[best]
+        # Exploitation when the bonus didn't change the pick
+        if best == greedy:
             note = "exploitation"
+        else:
+            note = "exploration"
 
         self.memory.update_confidence(
             chosen.fingerprint,
-            delta=0.05 if note == "exploitation" else 0.01
+            delta=0.05 if note == "exploitation" else 0.01,
+            ts=now
         )
 
         return StrategyDecision(
             context_tags=context_tags,
-            considered=scores,
+            considered=dict(zip(self.memory.names, score_vec)) if record_considered else None,
             chosen_strategy=chosen.name,
-            ts=now_ts(),
+            ts=now,
             notes=note
         )
 
@@ -102,8 +261,14 @@ class StrategySelector:
 # Demo Setup
 # -----------------------------
 
-@dataclass
+@dataclass(slots=True)
 class Strategy:
+    """
+    Once added to a StrategyMemory, the selector reads the memory's columns,
+    not this object. Change confidence and usage only through
+    StrategyMemory.update_confidence (which mirrors them back here), or add
+    a replacement Strategy with the same name; direct edits are not seen.
+    """
     name: str
     description: str
     context_tags: List[str]
@@ -116,10 +281,10 @@ class Strategy:
         self.fingerprint = stable_hash(self.name)
 
 
-@dataclass
+@dataclass(slots=True)
 class StrategyDecision:
     context_tags: List[str]
-    considered: Dict[str, float]
+    considered: Optional[Dict[str, float]]
     chosen_strategy: str
     ts: float
     notes: str
@@ -167,7 +332,7 @@ selector = StrategySelector(memory)
 
 context = ["high_stakes", "demo", "time_pressure"]
 
-decision = selector.select(context)
+decision = selector.select(context, record_considered=True)
 
 print("\n=== STRATEGY DECISION ===")
 print(json.dumps(asdict(decision), indent=2))
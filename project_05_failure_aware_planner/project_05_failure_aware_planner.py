@@ -14,14 +14,14 @@ import json
 # Data Models
 # -----------------------------
 
-@dataclass
+@dataclass(slots=True)
 class FailureRecord:
     action: str
     cause: str
     ts: float
 
 
-@dataclass
+@dataclass(slots=True)
 class Plan:
     goal: str
     actions: List[str]
@@ -42,6 +42,21 @@ def classify_failure(action: str) -> str:
     return "unknown_failure"
 
 
+class FailureMemory:
+    """
+    Failures recorded per action.
+    """
+
+    def __init__(self):
+        self.failures: Dict[str, List[FailureRecord]] = {}
+
+    def record(self, action: str, cause: str):
+        self.failures.setdefault(action, []).append(FailureRecord(action, cause, time.time()))
+
+    def has_failed(self, action: str) -> bool:
+        return action in self.failures
+
+
 # -----------------------------
 # Planner with Mutation
 # -----------------------------
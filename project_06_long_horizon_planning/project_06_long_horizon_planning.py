@@ -5,8 +5,9 @@
 
 import time
 import random
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from collections import deque
+from dataclasses import dataclass, asdict, field
+from typing import Deque, List, Dict, Optional, Tuple
 import json
 
 
@@ -14,17 +15,39 @@ import json
 # Data Models
 # -----------------------------
 
-@dataclass
+# History event codes. Events are stored as (code, arg) tuples and only
+# formatted when the history is rendered.
+_EV_PROGRESS = 1   # arg: progress in percent
+_EV_REPLAN = 2
+_EV_ABANDON = 3
+
+# Events kept per goal; older ones are dropped so long runs stay bounded
+_HISTORY_LEN = 1024
+
+@dataclass(slots=True)
 class GoalState:
     goal: str
     confidence: float = 0.7
     active: bool = True
     progress: float = 0.0
     last_checkpoint_ts: float = field(default_factory=time.time)
-    history: List[str] = field(default_factory=list)
-
-
-@dataclass
+    history: Deque[Tuple[int, int]] = field(
+        default_factory=lambda: deque(maxlen=_HISTORY_LEN)
+    )
+
+    def render_history(self) -> List[str]:
+        out = []
+        for code, arg in self.history:
+            if code == _EV_PROGRESS:
+                out.append(f"progress_updated:{arg / 100}")
+            elif code == _EV_REPLAN:
+                out.append("replanning_triggered")
+            elif code == _EV_ABANDON:
+                out.append("goal_abandoned")
+        return out
+
+
+@dataclass(slots=True)
 class Checkpoint:
     description: str
     expected_progress: float
@@ -49,20 +72,29 @@ class LongHorizonPlanner:
         """
         Simulate incremental progress.
         """
-        increment = random.uniform(0.05, 0.2)
-        state.progress = min(1.0, state.progress + increment)
-        state.history.append(f"progress_updated:{round(state.progress,2)}")
-        state.last_checkpoint_ts = time.time()
+        self.update_progress_batch([state])
+
+    def update_progress_batch(self, states: List[GoalState]):
+        """
+        Simulate incremental progress for many goals at once: one clock read
+        for the whole batch and no per-state method dispatch.
+        """
+        now = time.time()
+        uniform = random.uniform
+        for state in states:
+            state.progress = min(1.0, state.progress + uniform(0.05, 0.2))
+            state.history.append((_EV_PROGRESS, round(state.progress * 100)))
+            state.last_checkpoint_ts = now
 
     def replan(self, state: GoalState):
         """
         Adjust confidence and log replanning.
         """
         state.confidence -= 0.1
-        state.history.append("replanning_triggered")
+        state.history.append((_EV_REPLAN, 0))
         if state.confidence < 0.3:
             state.active = False
-            state.history.append("goal_abandoned")
+            state.history.append((_EV_ABANDON, 0))
 
 
 # -----------------------------
@@ -102,4 +134,6 @@ for cp in checkpoints:
         print("✅ On track")
 
 print("\n=== FINAL GOAL STATE ===")
-print(json.dumps(goal_state.__dict__, indent=2))
+final_state = asdict(goal_state)
+final_state["history"] = goal_state.render_history()
+print(json.dumps(final_state, indent=2))